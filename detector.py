@@ -1,117 +1,191 @@
 # === Section 1: Import the necessary toolkits ===
-import pandas as pd  # The powerful library for data analysis
-from datetime import timedelta # Used for working with time differences
-import json # For creating the JSON report file
+import polars as pl  # A fast, multi-threaded DataFrame library with a "lazy" query engine
+import pyarrow as pa # For reading the Arrow stream file written by the logger
 
 # === Section 2: Configuration ===
-CSV_FILE = 'structured_metrics.csv'
+METRICS_FILE = 'metrics.arrows'
 # --- Anomaly Detection thresholds ---
 TEMP_THRESHOLD = 80.0  # Anything above this is a "critical" temperature
 VOLTAGE_THRESHOLD_HIGH = 5.5
 VOLTAGE_THRESHOLD_LOW = 4.5
 TEMP_RATE_OF_CHANGE_THRESHOLD = 15.0 # A change of 15 degrees in one time step is a problem
 HEARTBEAT_TIMEOUT_SECONDS = 4 # If we don't hear from the device for 4 seconds, it's an issue
+HEARTBEAT_TIMEOUT_US = HEARTBEAT_TIMEOUT_SECONDS * 1_000_000 # The same timeout, in microseconds
+
+# --- Anomaly types and severities ---
+# Every anomaly gets one of these names, so we define each name exactly once.
+TYPE_TEMP = 'THRESHOLD_BREACH_TEMP'
+TYPE_VOLTAGE = 'THRESHOLD_BREACH_VOLTAGE'
+TYPE_RAPID_CHANGE = 'RAPID_CHANGE_TEMP'
+TYPE_HEARTBEAT = 'HEARTBEAT_LOSS'
+SEVERITY_CRITICAL = 'CRITICAL'
+SEVERITY_WARNING = 'WARNING'
+# An 'Enum' column stores each name only once; every row just holds a small number pointing to it,
+# instead of its own copy of the text.
+ANOMALY_TYPE = pl.Enum([TYPE_TEMP, TYPE_VOLTAGE, TYPE_RAPID_CHANGE, TYPE_HEARTBEAT])
+SEVERITY = pl.Enum([SEVERITY_CRITICAL, SEVERITY_WARNING])
+# How serious each type of anomaly is (also the order they are listed in for the same timestamp).
+SEVERITY_BY_TYPE = {
+    TYPE_TEMP: SEVERITY_CRITICAL,
+    TYPE_VOLTAGE: SEVERITY_CRITICAL,
+    TYPE_RAPID_CHANGE: SEVERITY_WARNING,
+    TYPE_HEARTBEAT: SEVERITY_CRITICAL,
+}
+
+# Helper to read the metrics file written by the logger.
+# The logger may still be running (or may have been stopped abruptly) while we read, so the last batch
+# in the file can be only partly written. We keep every complete batch and skip that last one.
+def read_metrics(path):
+    batches = []
+    with pa.ipc.open_stream(path) as reader:
+        try:
+            for batch in reader:
+                batches.append(batch)
+        except (OSError, pa.ArrowInvalid):
+            print("[WARNING] The last batch of the metrics file is incomplete and was skipped.")
+        return pl.from_arrow(pa.Table.from_batches(batches, schema=reader.schema))
+
+# Helper to turn a number column into text with a fixed number of decimals (e.g. 95.5 -> "95.50").
+# We use Python's own number formatting (the same as an f-string's ':.2f'), so rounding and very
+# large or negative values come out exactly as they always have. It only runs on the few flagged rows.
+def format_number(column, decimals):
+    return column.map_elements(f'{{:.{decimals}f}}'.format, return_dtype=pl.String)
+
+# Helper to turn a timestamp column into ISO 8601 text, matching Python's datetime.isoformat():
+# microseconds are shown as 6 digits, or left out entirely when they are exactly zero.
+def format_timestamp(column):
+    return (
+        pl.when(column.dt.microsecond() == 0)
+        .then(column.dt.to_string('%Y-%m-%dT%H:%M:%S'))
+        .otherwise(column.dt.to_string('%Y-%m-%dT%H:%M:%S%.6f'))
+    )
+
+# The JSON report always has exactly the same four fields, so rather than using a general-purpose
+# JSON library we fill in this fixed, already pretty-printed template once per anomaly.
+# Each '{}' is replaced by a value; '{{' and '}}' stand for the JSON object's own curly braces.
+JSON_RECORD_TEMPLATE = (
+    '  {{\n'
+    '    "timestamp": "{}",\n'
+    '    "type": "{}",\n'
+    '    "severity": "{}",\n'
+    '    "description": "{}"\n'
+    '  }}'
+)
+
+# Helper to make a text column safe to put inside a JSON string.
+# Only the descriptions need this: timestamps and our anomaly names never contain quotes or backslashes.
+def escape_json(column):
+    return column.str.replace_all('\\', '\\\\', literal=True).str.replace_all('"', '\\"', literal=True)
 
 # === Section 3: The Main Program ===
 print("--- Anomaly Detection Engine Started ---")
 
 try:
-    # Use pandas to read our CSV into a 'DataFrame'.
-    # A DataFrame is like a super-powered spreadsheet in memory.
-    # We also tell it to understand that our 'timestamp' column contains dates and times.
-    df = pd.read_csv(CSV_FILE, parse_dates=['timestamp'])
+    # Use Polars to *describe* how to process our metrics as a 'LazyFrame'.
+    # Nothing is actually read yet: Polars collects every step into one query plan,
+    # then runs the whole plan in a single optimized, multi-threaded pass at the end.
+    # The Arrow file already stores every column with its type (e.g. 'timestamp' as dates and times),
+    # so there is no text to parse, only compressed columns to load.
+    metrics = (
+        read_metrics(METRICS_FILE).lazy()
+        # Make sure the data is sorted by time, just in case.
+        .sort('timestamp')
+        # Calculate the difference in temperature and in time between each row and the one before it.
+        # Both differences are worked out together, in the same single pass over the sorted data.
+        # Time is compared as a plain whole number of microseconds since 1970 ('epoch'),
+        # which is the cheapest possible comparison for the computer to make.
+        .with_columns(
+            pl.col('temperature').diff().alias('temp_change'),
+            pl.col('timestamp').dt.epoch('us').diff().alias('time_diff_us'),
+        )
+        # Check every detection rule for every row in that same pass over the data.
+        # Each rule becomes a True/False "flag" column that the detection methods below reuse.
+        .with_columns(
+            (pl.col('temperature') > TEMP_THRESHOLD).alias('is_temp_breach'),
+            ((pl.col('voltage') > VOLTAGE_THRESHOLD_HIGH) | (pl.col('voltage') < VOLTAGE_THRESHOLD_LOW)).alias('is_voltage_breach'),
+            (pl.col('temp_change').abs() > TEMP_RATE_OF_CHANGE_THRESHOLD).alias('is_rapid_change'),
+            (pl.col('time_diff_us') > HEARTBEAT_TIMEOUT_US).alias('is_heartbeat_loss'),
+        )
+    )
 
-    # Make sure the data is sorted by time, just in case.
-    df = df.sort_values(by='timestamp').reset_index(drop=True)
-    
-    print(f"Successfully loaded {len(df)} records from '{CSV_FILE}'.")
-    
-    anomalies_found = [] # An empty list to store all the problems we find.
-
-    # --- Detection Method 1: Simple Threshold Breaches ---
-    # Find all rows where the temperature is above our threshold.
-    temp_anomalies = df[df['temperature'] > TEMP_THRESHOLD]
-    for index, row in temp_anomalies.iterrows():
-        anomaly_details = {
-            'timestamp': row['timestamp'],
-            'type': 'THRESHOLD_BREACH_TEMP',
-            'severity': 'CRITICAL',
-            'description': f"Temperature {row['temperature']:.2f}°C exceeded threshold of {TEMP_THRESHOLD}°C."
-        }
-        anomalies_found.append(anomaly_details)
-    
-    # Do the same for voltage spikes.
-    voltage_anomalies = df[(df['voltage'] > VOLTAGE_THRESHOLD_HIGH) | (df['voltage'] < VOLTAGE_THRESHOLD_LOW)]
-    for index, row in voltage_anomalies.iterrows():
-        anomaly_details = {
-            'timestamp': row['timestamp'],
-            'type': 'THRESHOLD_BREACH_VOLTAGE',
-            'severity': 'CRITICAL',
-            'description': f"Voltage {row['voltage']:.2f}V was outside the normal range."
-        }
-        anomalies_found.append(anomaly_details)
-
-    # --- Detection Method 2: Rate-of-Change Anomalies ---
-    # Calculate the difference in temperature between each row and the one before it.
-    df['temp_change'] = df['temperature'].diff()
-    
-    # Find all rows where the change is greater than our threshold.
-    roc_anomalies = df[df['temp_change'].abs() > TEMP_RATE_OF_CHANGE_THRESHOLD]
-    for index, row in roc_anomalies.iterrows():
-        anomaly_details = {
-            'timestamp': row['timestamp'],
-            'type': 'RAPID_CHANGE_TEMP',
-            'severity': 'WARNING',
-            'description': f"Temperature changed by {row['temp_change']:.2f}°C, exceeding the rate-of-change threshold."
-        }
-        anomalies_found.append(anomaly_details)
-
-    # --- Detection Method 3: Heartbeat Loss Detection ---
-    # Calculate the time difference between each row and the one before it.
-    df['time_diff'] = df['timestamp'].diff()
+    # Keep only the rows that broke at least one rule. This is the only step that looks at every row;
+    # the descriptions below are then only written for this (usually very small) table.
+    flagged = metrics.filter(pl.any_horizontal('is_temp_breach', 'is_voltage_breach', 'is_rapid_change', 'is_heartbeat_loss'))
+
+    # Give every flagged row one description column per kind of anomaly, named after that anomaly type.
+    # A column only gets a description where its rule was broken, and is left empty (null) everywhere else.
+    described = flagged.select(
+        'timestamp',
+        # --- Detection Method 1: Simple Threshold Breaches ---
+        # Rows where the temperature is above our threshold.
+        pl.when('is_temp_breach').then(pl.format(
+            f"Temperature {{}}°C exceeded threshold of {TEMP_THRESHOLD}°C.", format_number(pl.col('temperature'), 2),
+        )).alias(TYPE_TEMP),
+        # Do the same for voltage spikes.
+        pl.when('is_voltage_breach').then(pl.format(
+            "Voltage {}V was outside the normal range.", format_number(pl.col('voltage'), 2),
+        )).alias(TYPE_VOLTAGE),
+        # --- Detection Method 2: Rate-of-Change Anomalies ---
+        # Rows where the change is greater than our threshold.
+        pl.when('is_rapid_change').then(pl.format(
+            "Temperature changed by {}°C, exceeding the rate-of-change threshold.", format_number(pl.col('temp_change'), 2),
+        )).alias(TYPE_RAPID_CHANGE),
+        # --- Detection Method 3: Heartbeat Loss Detection ---
+        # Rows where the time gap is larger than our timeout.
+        pl.when('is_heartbeat_loss').then(pl.format(
+            "No data received for {} seconds. Device may be offline.", format_number(pl.col('time_diff_us') / 1_000_000, 1),
+        )).alias(TYPE_HEARTBEAT),
+    )
+
+    # 'Unpivot' the four description columns into rows: one row per (timestamp, type, description),
+    # where 'type' is the name of the column the description came from. Dropping the empty
+    # descriptions leaves exactly one row per anomaly. Then we look up each anomaly's severity
+    # and sort by time for a chronological report ('maintain_order' keeps anomalies with the same
+    # timestamp in the order we detected them). Once sorted, the timestamps are turned into
+    # ISO 8601 text, ready for both reports.
+    all_anomalies = (
+        described
+        .unpivot(index='timestamp', on=list(SEVERITY_BY_TYPE), variable_name='type', value_name='description')
+        .drop_nulls('description')
+        .select(
+            'timestamp',
+            pl.col('type').cast(ANOMALY_TYPE),
+            pl.col('type').replace_strict(SEVERITY_BY_TYPE, return_dtype=SEVERITY).alias('severity'),
+            'description',
+        )
+        .sort('timestamp', maintain_order=True)
+        .with_columns(format_timestamp(pl.col('timestamp')).alias('timestamp'))
+    )
+
+    # Now run everything. collect_all() runs both queries together, so the shared steps (like sorting)
+    # are only done once, and the streaming engine works through the data in chunks.
+    anomalies, record_count = pl.collect_all([all_anomalies, metrics.select(pl.len())], engine='streaming')
+
+    print(f"Successfully loaded {record_count.item()} records from '{METRICS_FILE}'.")
     
-    # Find all rows where the time gap is larger than our timeout.
-    heartbeat_anomalies = df[df['time_diff'] > timedelta(seconds=HEARTBEAT_TIMEOUT_SECONDS)]
-    for index, row in heartbeat_anomalies.iterrows():
-        time_gap = row['time_diff'].total_seconds()
-        anomaly_details = {
-            'timestamp': row['timestamp'],
-            'type': 'HEARTBEAT_LOSS',
-            'severity': 'CRITICAL',
-            'description': f"No data received for {time_gap:.1f} seconds. Device may be offline."
-        }
-        anomalies_found.append(anomaly_details)
 
 
     # === Section 4: Generate Reports ===
     print("\n--- ANOMALY REPORT (CONSOLE) ---")
-    if anomalies_found:
-        # Sort anomalies by time for a chronological report
-        anomalies_found.sort(key=lambda x: x['timestamp'])
-        
+    if len(anomalies) > 0:
         # 1. Print the human-readable report to the console
-        for anomaly in anomalies_found:
-            # We need to convert the timestamp object to a string for printing
-            ts_str = anomaly['timestamp'].isoformat()
-            print(f"[{ts_str}]-[{anomaly['severity']}]-[{anomaly['type']}] : {anomaly['description']}")
-
-        # 2. Create the machine-readable JSON report
-        # We need to prepare the data for JSON, as it doesn't understand pandas timestamps directly.
-        json_report_data = []
-        for anomaly in anomalies_found:
-            json_report_data.append({
-                'timestamp': anomaly['timestamp'].isoformat(), # Convert timestamp to a standard string
-                'type': anomaly['type'],
-                'severity': anomaly['severity'],
-                'description': anomaly['description']
-            })
-
-        # Write the data to a .json file
+        # Polars fills in the same line template for every anomaly in one go,
+        # so we only have to print the finished lines.
+        report_lines = anomalies.select(pl.format(
+            "[{}]-[{}]-[{}] : {}", 'timestamp', 'severity', 'type', 'description',
+        )).to_series()
+        print("\n".join(report_lines))
+
+        # 2. Create the machine-readable JSON report and write it to a .json file
+        # Our anomalies stay in their table, one column per field, all the way to the end.
+        # Polars fills in the JSON template for every anomaly in one go and joins them into a list,
+        # so we never build a separate Python dictionary for every anomaly.
+        json_records = anomalies.select(pl.format(
+            JSON_RECORD_TEMPLATE, 'timestamp', 'type', 'severity', escape_json(pl.col('description')),
+        )).to_series()
         try:
-            with open('anomaly_report.json', 'w') as f:
-                # json.dump writes the data.
-                # 'indent=4' makes the file easy for humans to read ("pretty-printing").
-                json.dump(json_report_data, f, indent=4)
+            with open('anomaly_report.json', 'w', encoding='utf-8') as f:
+                f.write("[\n" + json_records.str.join(",\n").item() + "\n]")
             print("\n--- Successfully generated 'anomaly_report.json' ---")
         except Exception as e:
             print(f"\n[ERROR] Could not write JSON report: {e}")
@@ -120,6 +194,6 @@ try:
         print("No anomalies detected. System is operating normally.")
 
 except FileNotFoundError:
-    print(f"[ERROR] Could not find the file '{CSV_FILE}'. Please run the logger_service.py first to generate data.")
+    print(f"[ERROR] Could not find the file '{METRICS_FILE}'. Please run the logger_service.py first to generate data.")
 except Exception as e:
     print(f"An unexpected error occurred: {e}")
\ No newline at end of file
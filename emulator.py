@@ -7,6 +7,7 @@ import random  # This library helps us generate random numbers to make our data
 # Here we define our settings. It's good practice to keep them at the top.
 SERIAL_PORT = 'COM5'    # This is the port our "device" will send data TO.
 BAUD_RATE = 9600        # The speed of communication. Must match the listener later.
+SEND_BUFFER_BYTES = 512 # Lines sent back-to-back are grouped into one write of up to this many bytes.
 
 # === Section 3: The Main Program ===
 print("--- Device Emulator Started ---")
@@ -22,12 +23,28 @@ try:
         # === FORCED FAILURE TEST SEQUENCE ===
     print("\n--- RUNNING FORCED FAILURE SEQUENCE ---")
 
+    # Lines waiting to be sent. Every ser.write() call has a fixed cost, so when lines are sent
+    # back-to-back (delay=0) we collect them here and send them together in a single write.
+    out_buffer = bytearray()
+
+    # Helper function to send everything that is waiting in the buffer.
+    # The buffer is emptied before writing, so a failed write is never sent a second time.
+    def flush_output():
+        if out_buffer:
+            data = bytes(out_buffer)
+            out_buffer.clear()
+            ser.write(data)
+
     # Helper function to make sending easier
-    def send_data(temp, voltage, status):
+    def send_data(temp, voltage, status, delay=1):
         data_string = f"T:{temp:.2f},V:{voltage:.2f},S:{status}\n"
-        ser.write(data_string.encode('utf-8'))
+        out_buffer.extend(data_string.encode('utf-8'))
         print(f"Sent: {data_string.strip()}")
-        time.sleep(1)
+        # If we're about to wait (or the buffer is full), send now so the line isn't held back.
+        # The logger timestamps lines when they arrive, so this keeps the timing of each line exact.
+        if delay > 0 or len(out_buffer) >= SEND_BUFFER_BYTES:
+            flush_output()
+        time.sleep(delay)
 
     # 1. Normal data
     send_data(50.0, 5.0, "NORMAL")
@@ -83,19 +100,10 @@ try:
     #         time.sleep(5)
     #         continue # Skip the rest of this loop and start a new one
 
-    #     # Format our data into a single string. f-strings are great for this.
-    #     # The '\n' at the end is a "newline" character. It's like pressing Enter.
-    #     data_string = f"T:{temp:.2f},V:{voltage:.2f},S:{status_code}\n"
-
-    #     # Send the data!
-    #     # Computers send bytes, not letters, so we must .encode() our string into bytes.
-    #     ser.write(data_string.encode('utf-8'))
-
-    #     # Print to our own console so we can see what's being sent.
-    #     print(f"Sent: {data_string.strip()}") # .strip() removes the newline for cleaner printing
-
-    #     # Wait for a moment before sending the next piece of data.
-    #     time.sleep(sleep_time)
+    #     # Send the data, then wait for a moment before sending the next piece.
+    #     # send_data() groups lines in out_buffer: with a sleep_time of 0 (a high-rate device),
+    #     # many lines go out together in one write instead of one write per line.
+    #     send_data(temp, voltage, status_code, delay=sleep_time)
 
 # This 'except' block will run if the 'try' block fails (e.g., COM5 is busy).
 except Exception as e:
@@ -108,5 +116,10 @@ finally:
     # This 'finally' block runs no matter what, even if there was an error.
     # It's crucial for making sure we always "hang up the phone" properly.
     if 'ser' in locals() and ser.is_open:
+        if 'out_buffer' in locals():
+            try:
+                flush_output() # Send any lines still waiting in the buffer before hanging up
+            except serial.SerialException as e:
+                print(f"[ERROR] Could not send the last lines: {e}")
         ser.close()
         print(f"Serial port {SERIAL_PORT} closed.")
\ No newline at end of file
@@ -1,26 +1,66 @@
 # === Section 1: Import the necessary toolkits ===
 import serial
-import csv
-from datetime import datetime
+import pyarrow as pa           # The Apache Arrow columnar data format (and its compressed stream files)
+import re
+import functools
+import os
 import time
 
 # === Section 2: Configuration ===
 SERIAL_PORT = 'COM6'      # This is the port we will LISTEN on.
 BAUD_RATE = 9600
 RAW_LOG_FILE = 'raw.log'  # The file for the raw, untouched data
-CSV_FILE = 'structured_metrics.csv' # The file for the clean, parsed data
+METRICS_FILE = 'metrics.arrows' # The file for the clean, parsed data (an Arrow stream)
 ERROR_LOG_FILE = 'parser_errors.log' # A file for any lines we can't understand
+METRICS_BATCH_SIZE = 1024 # Write parsed rows to the metrics file in groups of this many
+MAX_LINE_BYTES = 256      # A "line" this long without a newline is garbage, so we stop waiting for the rest
 
-# === Section 3: Prepare the CSV File ===
-# This part runs once at the beginning to set up our CSV file with headers.
+# The exact shape of a valid line, e.g. b"T:48.13,V:5.04,S:NORMAL".
+# Compiling the pattern once up front lets us check the format and pull out all
+# three values in a single pass, instead of splitting the line into many small pieces.
+# It works directly on the raw bytes from the serial port, so we never need to decode good lines.
+PARSE_RE = re.compile(rb'^T:(-?\d+(?:\.\d+)?),V:(-?\d+(?:\.\d+)?),S:(\S+)$')
+
+# The column titles of our metrics file, and the type of data in each one.
+METRICS_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us')),
+    ('temperature', pa.float64()),
+    ('voltage', pa.float64()),
+    ('status_code', pa.string()),
+])
+
+# Helper to check one line's format and pull out its (temperature, voltage, status) values.
+# It returns None if the line isn't in the format we expect.
+# Devices often send the exact same line many times in a row, so we remember the results for
+# the most recently seen 256 different lines and skip re-parsing any line we've already seen.
+@functools.lru_cache(maxsize=256)
+def parse_line(line):
+    match = PARSE_RE.match(line)
+    if not match:
+        return None
+    # Convert the captured numbers into actual numbers (floats)
+    return float(match.group(1)), float(match.group(2)), match.group(3).decode('utf-8')
+
+# Helper to add a list of (timestamp, temperature, voltage, status) rows to the metrics file as one batch.
+# Arrow stores data column by column, so we regroup the rows into one list per column first.
+def write_rows(rows):
+    columns = zip(*rows)
+    writer.write_batch(pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, METRICS_SCHEMA)],
+        schema=METRICS_SCHEMA,
+    ))
+
+# === Section 3: Prepare the Metrics File ===
+# This part runs once at the beginning to create our metrics file with its columns.
+# Unlike a CSV, an Arrow stream stores each column typed and compressed, so the detector
+# doesn't have to re-read numbers and dates from text. The batches are simply added one after another,
+# and each one is complete on disk as soon as it is written. So everything written so far can be read
+# while the logger is still running, and survives even if the logger is stopped abruptly.
 try:
-    with open(CSV_FILE, 'w', newline='') as f:
-        writer = csv.writer(f)
-        # These are the column titles
-        writer.writerow(['timestamp', 'temperature', 'voltage', 'status_code'])
-    print(f"'{CSV_FILE}' created with headers.")
+    writer = pa.ipc.new_stream(METRICS_FILE, METRICS_SCHEMA, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+    print(f"'{METRICS_FILE}' created.")
 except Exception as e:
-    print(f"Error setting up CSV file: {e}")
+    print(f"Error setting up metrics file: {e}")
 
 # === Section 4: The Main Service Loop ===
 print("--- Logger Service Started ---")
@@ -30,64 +70,109 @@ try:
     # Open the port we are listening on
     ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
 
+    # Open our raw log file once and keep it open for the whole run.
+    # Re-opening a file for every line is slow, so we keep a low-level OS "file descriptor" instead.
+    # Writing to it hands each line straight to the operating system in one call, with no extra
+    # Python buffering, and O_APPEND makes every line land whole at the end of the file.
+    # (O_BINARY only exists on Windows: it stores the exact bytes received, without newline conversion.)
+    raw_fd = os.open(RAW_LOG_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+
+    # Parsed rows wait here and are written to the metrics file as one batch,
+    # so reading from the serial port isn't held up by a disk write for every sample.
+    pending_rows = []
+
+    # Bytes we've received but haven't split into lines yet (a line may arrive in several pieces).
+    read_buffer = bytearray()
+
+    # Turning the current time into text is surprisingly slow, and during a burst of data many lines
+    # arrive within the same second. So we remember the date-and-time text for the current second
+    # (e.g. "2023-10-27T14:30:15") and only work out the microseconds for each line.
+    cached_second = None
+
     while True:
-        # Read one line of data from the serial port.
-        # This will wait until it sees a newline character ('\n')
-        line = ser.readline().decode('utf-8').strip()
-
-        # Check if the line is not empty
-        if line:
-            # Get the current time with high precision
-            timestamp = datetime.now().isoformat()
-            
-            # --- Task 1: Log the raw, untouched data for auditing ---
-            try:
-                with open(RAW_LOG_FILE, 'a') as raw_file:
-                    raw_file.write(f"{timestamp} | {line}\n")
-            except Exception as e:
-                print(f"Error writing to raw log: {e}")
+        # Read every byte that has already arrived in one go (or wait for at least one byte,
+        # up to the 1 second timeout). This is much cheaper than reading a line one byte at a time.
+        chunk = ser.read(max(1, ser.in_waiting))
+        read_buffer.extend(chunk)
 
+        # Collect each complete line (ending with a newline character '\n') we now have.
+        # Anything after the last newline stays in the buffer until the rest of it arrives.
+        lines = []
+        while (newline_at := read_buffer.find(b'\n')) >= 0:
+            lines.append((bytes(read_buffer[:newline_at]), True))
+            del read_buffer[:newline_at + 1]
 
-            # --- Task 2: Try to parse the data and log it to CSV ---
-            # We put this in a 'try...except' block to be fault tolerant
-            try:
-                # Example line: "T:48.13,V:5.04,S:NORMAL"
-                parts = line.split(',')
-                # Check for correct format before trying to access indexes
-                if len(parts) == 3 and parts[0].startswith('T:') and parts[1].startswith('V:') and parts[2].startswith('S:'):
-                    temp_str = parts[0].split(':')[1]
-                    volt_str = parts[1].split(':')[1]
-                    status = parts[2].split(':')[1]
-
-                    # Convert the string numbers into actual numbers (floats)
-                    temp_float = float(temp_str)
-                    volt_float = float(volt_str)
-                    
-                    # Write the clean data to our structured CSV file
-                    with open(CSV_FILE, 'a', newline='') as csv_file:
-                        writer = csv.writer(csv_file)
-                        writer.writerow([timestamp, temp_float, volt_float, status])
-                    
-                    print(f"Logged: {timestamp}, {temp_float}, {volt_float}, {status}")
+        # ...but not forever. If the read timed out (nothing arrived for 1 second) or the text has grown
+        # too long, what we have is never going to become a proper line. We handle it as a broken line,
+        # so it is still kept in the raw log and reported as a parse error.
+        if read_buffer and (not chunk or len(read_buffer) >= MAX_LINE_BYTES):
+            lines.append((bytes(read_buffer), False))
+            read_buffer.clear()
 
-                else:
-                    # If the line isn't in the format we expect, raise an error to be caught below
-                    raise ValueError(f"Malformed data structure: {line}")
+        for line, complete in lines:
+            line = line.strip()
 
-            except (ValueError, IndexError) as e:
-                # If anything goes wrong in the 'try' block above, this code runs.
-                error_message = f"{timestamp} | PARSE_ERROR | {e}\n"
-                print(f"  [!] FAILED TO PARSE: {line}")
+            # Check if the line is not empty
+            if line:
+                # Get the current time with high precision
+                seconds, nanoseconds = divmod(time.time_ns(), 1_000_000_000)
+                if seconds != cached_second:
+                    local_time = time.localtime(seconds)
+                    second_text = time.strftime('%Y-%m-%dT%H:%M:%S', local_time)
+                    # The same second as a number of microseconds, in local time like the text above
+                    second_us = (seconds + local_time.tm_gmtoff) * 1_000_000
+                    cached_second = seconds
+                microseconds = nanoseconds // 1000
+                timestamp = f"{second_text}.{microseconds:06d}"
                 
-                # Log the specific error to our error log file.
+                # --- Task 1: Log the raw, untouched data for auditing ---
                 try:
-                    with open(ERROR_LOG_FILE, 'a') as error_file:
-                        error_file.write(error_message)
+                    os.write(raw_fd, b"%b | %b\n" % (timestamp.encode('ascii'), line))
                 except Exception as e:
-                    print(f"Error writing to error log: {e}")
-        
-        # A small sleep to prevent the loop from running too fast if no data is coming in
-        time.sleep(0.01)
+                    print(f"Error writing to raw log: {e}")
+
+
+                # --- Task 2: Try to parse the data and log it to the metrics file ---
+                # We put this in a 'try...except' block to be fault tolerant
+                try:
+                    # Example line: "T:48.13,V:5.04,S:NORMAL"
+                    # Check for correct format and capture the three values in one step
+                    parsed = parse_line(line) if complete else None
+                    if parsed:
+                        temp_float, volt_float, status = parsed
+                        
+                        # Queue the clean data for our structured metrics file
+                        pending_rows.append((second_us + microseconds, temp_float, volt_float, status))
+                        
+                        print(f"Logged: {timestamp}, {temp_float}, {volt_float}, {status}")
+
+                    else:
+                        # If the line isn't in the format we expect, raise an error to be caught below
+                        problem = "Malformed data structure" if complete else "Incomplete line (no newline received)"
+                        raise ValueError(f"{problem}: {line.decode('utf-8', errors='replace')}")
+
+                except ValueError as e:
+                    # If anything goes wrong in the 'try' block above, this code runs.
+                    error_message = f"{timestamp} | PARSE_ERROR | {e}\n"
+                    print(f"  [!] FAILED TO PARSE: {line.decode('utf-8', errors='replace')}")
+                    
+                    # Log the specific error to our error log file.
+                    try:
+                        with open(ERROR_LOG_FILE, 'a') as error_file:
+                            error_file.write(error_message)
+                    except Exception as e:
+                        print(f"Error writing to error log: {e}")
+
+
+        # --- Task 3: Write full batches of rows to the metrics file ---
+        # Every batch carries some bookkeeping of its own, so large batches keep the file small.
+        # (Rows that haven't been written yet are always in the raw log too.)
+        if len(pending_rows) >= METRICS_BATCH_SIZE:
+            try:
+                write_rows(pending_rows)
+            except Exception as e:
+                print(f"Error writing metrics file: {e}")
+            pending_rows.clear()
 
 except serial.SerialException as e:
     print(f"\n[ERROR] Could not open port '{SERIAL_PORT}'. Is the virtual port pair active?")
@@ -95,6 +180,15 @@ except serial.SerialException as e:
 except KeyboardInterrupt:
     print("\n--- Logger Service Stopped by User ---")
 finally:
+    if 'raw_fd' in locals():
+        os.close(raw_fd)
+    if 'writer' in locals():
+        try:
+            if 'pending_rows' in locals() and pending_rows:
+                write_rows(pending_rows) # Don't lose rows that were still waiting for the next batch
+            writer.close() # Marks the end of the stream
+        except Exception as e:
+            print(f"Error writing metrics file: {e}")
     if 'ser' in locals() and ser.is_open:
         ser.close()
         print(f"Serial port {SERIAL_PORT} closed.")
\ No newline at end of file
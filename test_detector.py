@@ -0,0 +1,51 @@
+# Checks that detector.py writes its anomaly descriptions exactly like Python f-strings would,
+# including for huge values, negative values and values that sit on a rounding tie.
+# Run with: python -m pytest
+import json
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import polars as pl
+import pyarrow as pa
+
+DETECTOR = Path(__file__).with_name('detector.py')
+
+
+def run_detector(tmp_path, rows):
+    # detector.py is a script, so we run it the same way a user would, inside a scratch folder
+    # The rows are written in two batches into one Arrow stream, just like the logger writes them
+    timestamps, temperatures, voltages = zip(*rows)
+    metrics = pl.DataFrame({
+        'timestamp': pl.Series(timestamps, dtype=pl.Datetime('us')),
+        'temperature': temperatures,
+        'voltage': voltages,
+        'status_code': ['TEST'] * len(rows),
+    })
+    half = len(rows) // 2
+    with pa.ipc.new_stream(tmp_path / 'metrics.arrows', metrics.to_arrow().schema) as writer:
+        writer.write_table(metrics.head(half).to_arrow())
+        writer.write_table(metrics.tail(len(rows) - half).to_arrow())
+    subprocess.run([sys.executable, str(DETECTOR)], cwd=tmp_path, check=True, capture_output=True)
+    return json.loads((tmp_path / 'anomaly_report.json').read_text(encoding='utf-8'))
+
+
+def test_descriptions_match_fstring_formatting(tmp_path):
+    start = datetime(2024, 1, 1)
+    rows = [
+        (start, 50.0, 5.0),
+        (start + timedelta(seconds=1), 1e45, 5.0),               # huge temperature
+        (start + timedelta(seconds=2), -35.5, 2.675),            # negative temperature, tie voltage
+        (start + timedelta(seconds=3), 123456.785, 5.0),         # tie temperature
+        (start + timedelta(seconds=7.35), 123456.785, -0.005),   # 4.35 second gap, negative tie voltage
+    ]
+    report = run_detector(tmp_path, rows)
+
+    descriptions = [anomaly['description'] for anomaly in report]
+    assert f"Temperature {1e45:.2f}°C exceeded threshold of 80.0°C." in descriptions
+    assert f"Temperature {123456.785:.2f}°C exceeded threshold of 80.0°C." in descriptions
+    assert f"Temperature changed by {-35.5 - 1e45:.2f}°C, exceeding the rate-of-change threshold." in descriptions
+    assert f"Voltage {2.675:.2f}V was outside the normal range." in descriptions
+    assert f"Voltage {-0.005:.2f}V was outside the normal range." in descriptions
+    assert f"No data received for {4.35:.1f} seconds. Device may be offline." in descriptions